@@ -1,14 +1,21 @@
+import csv
+import mmap
+import operator
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import pandas as pd
 
 # Define the CloudFront base URL
 CLOUDFRONT_URL = "https://d38pmlk0v88drf.cloudfront.net/wav16k/"
 
-# Regular expression to extract segment information from the log file
+# Regular expression to extract segment information from the log file.
+# Compiled in byte mode so it can run directly over a memory-mapped file
+# without decoding the whole log up front.
 SEGMENT_PATTERN = re.compile(
-    r"Segment (\d+)\nTime: ([\d.]+)s - ([\d.]+)s \(duration: ([\d.]+)s\)\nFilename: (.+)\nTranscription: (.+)"
+    rb"Segment (\d+)\nTime: ([\d.]+)s - ([\d.]+)s \(duration: ([\d.]+)s\)\nFilename: (.+)\nTranscription: (.+)"
 )
 
 
@@ -22,50 +29,29 @@ def get_log_file(folder):
     Returns:
     str: The path to the log file.
     """
-    log_files = [f for f in os.listdir(folder) if f.startswith("segments_log")]
-    if not log_files:
-        raise FileNotFoundError(f"No log file found in {folder}.")
-    return os.path.join(folder, log_files[0])
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.startswith("segments_log"):
+                return os.path.join(folder, entry.name)
+    raise FileNotFoundError(f"No log file found in {folder}.")
 
 
-def read_log_file(log_file_path):
+def extract_segments(log_file_path):
     """
-    Read the contents of the log file.
+    Stream audio segment information from a log file using a regular expression.
 
-    args:
-    log_file_path (str): Path to the log file.
-
-    Returns:
-    str: The content of the log file.
-    """
-    with open(log_file_path, encoding="utf-8") as log:
-        return log.read()
-
-
-def extract_segments(log_content):
-    """
-    Extract audio segment information from the log content using a regular expression.
-
-    args:
-    log_content (str): Content of the log file.
-
-    Returns:
-    list: A list of tuples containing segment information.
-    """
-    return SEGMENT_PATTERN.findall(log_content)
-
-
-def construct_audio_url(filename):
-    """
-    Construct the full audio URL based on the filename.
+    The file is memory-mapped and matched in byte mode, so the log is never
+    fully loaded or decoded; matches are yielded one at a time.
 
     args:
-    filename (str): The filename of the audio segment.
+    log_file_path (str): Path to the log file.
 
     Returns:
-    str: The full URL to access the audio file.
+    generator: An iterator of re.Match objects, one per segment.
     """
-    return f"{CLOUDFRONT_URL}{filename}"
+    with open(log_file_path, "rb") as log:
+        with mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from SEGMENT_PATTERN.finditer(mm)
 
 
 def process_segments(segments):
@@ -73,58 +59,59 @@ def process_segments(segments):
     Process each audio segment, extract the necessary data, and store it in a list.
 
     args:
-    segments (list): List of tuples containing segment information.
+    segments (iterator): Iterator of re.Match objects as yielded by extract_segments.
 
     Returns:
-    list: A list of processed data with each entry containing [filename, dept, audio_url, duration, transcription].
+    generator: An iterator of processed rows, each containing (filename, dept, audio_url, duration, transcription).
     """
-    data = []
-
-    for segment in segments:
-        segment_id, start_time, end_time, duration, filename, transcription = segment
+    for match in segments:
+        filename = match.group(5).decode("utf-8")
 
         # Extract department code (e.g., TT from 'STT_TT_D001_0001_0_to_3000.wav')
         dept = filename.split("_")[1]
 
-        # Construct the audio URL
-        audio_url = construct_audio_url(filename)
-
-        # Convert the duration from string to float (in seconds)
-        duration_in_seconds = float(duration)
-
-        # Append processed data to the list
-        data.append(
-            [filename, dept, audio_url, duration_in_seconds, transcription.strip()]
+        yield (
+            filename,
+            dept,
+            CLOUDFRONT_URL + filename,
+            float(match.group(4)),
+            match.group(6).decode("utf-8").strip(),
         )
 
-    return data
 
-
-def save_to_csv(data, output_csv):
+def sort_output_csv(output_csv):
     """
-    Save the processed data into a CSV file.
+    Rewrite the output CSV sorted by file_name and emit a Parquet copy.
+
+    Rows are streamed to the CSV as they are parsed, so the full data set is
+    only held in memory here, for this one final sort pass. The Parquet file
+    spares downstream consumers the CSV parse on every read; dept is stored
+    as a categorical so it is dictionary-encoded.
 
     args:
-    data (list): The processed data to be saved.
-    output_csv (str): Path to the output CSV file.
+    output_csv (str): Path to the CSV file to sort in place.
 
     Returns:
     None
     """
-    df = pd.DataFrame(
-        data,
-        columns=[
-            "file_name",
-            "dept",
-            "audio_url",
-            "audio_duration_in_seconds",
-            "transcript",
-        ],
-    )
-    df = df.sort_values(by="file_name")  # Sort by file_name in ascending order
-    df.to_csv(output_csv, index=False)
+    with open(output_csv, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = sorted(reader, key=operator.itemgetter(0))
+
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
     print(f"CSV file '{output_csv}' created successfully.")
 
+    df = pd.DataFrame(rows, columns=header)
+    df["dept"] = df["dept"].astype("category")
+    df["audio_duration_in_seconds"] = df["audio_duration_in_seconds"].astype("float32")
+    parquet_path = Path(output_csv).with_suffix(".parquet")
+    df.to_parquet(parquet_path, compression="zstd", index=False)
+    print(f"Parquet file '{parquet_path}' created successfully.")
+
 
 def process_audio_folders(audio_folders, output_csv):
     """
@@ -135,19 +122,36 @@ def process_audio_folders(audio_folders, output_csv):
     output_csv (str): Path to the output CSV file.
 
     """
-    data = []
 
-    for folder in audio_folders:
+    def _process_one(folder):
         try:
             log_file_path = get_log_file(folder)
-            log_content = read_log_file(log_file_path)
-            segments = extract_segments(log_content)
-            data.extend(process_segments(segments))
+            return list(process_segments(extract_segments(log_file_path)))
         except Exception as e:
             print(f"Error processing folder '{folder}': {str(e)}")
+            return []
+
+    # Each folder is parsed independently, so fan out over threads to overlap
+    # the per-folder file I/O (regex matching itself still holds the GIL) and
+    # write each folder's rows as soon as they arrive; only one folder's
+    # worth of rows is ever buffered in the writer loop.
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            [
+                "file_name",
+                "dept",
+                "audio_url",
+                "audio_duration_in_seconds",
+                "transcript",
+            ]
+        )
+        with ThreadPoolExecutor(max_workers=min(16, len(audio_folders))) as executor:
+            for rows in executor.map(_process_one, audio_folders):
+                writer.writerows(rows)
 
-    # Save the collected data to a CSV file
-    save_to_csv(data, output_csv)
+    # Sort the finished CSV by file_name in a single rewrite pass
+    sort_output_csv(output_csv)
 
 
 def main():